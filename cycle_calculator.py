@@ -2,9 +2,23 @@
 Cycle Calculator - Calculate cycle day and phase based on last period date and cycle length.
 """
 
-from datetime import datetime, date
+from datetime import date, timedelta
+from functools import lru_cache
 from typing import Tuple
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for calculate_cycle_day_batch
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; fall back to plain Python
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
 
 def calculate_cycle_day_and_phase(last_period_date: date, cycle_length: int = 28, current_date: date = None) -> Tuple[int, str, str]:
     """
@@ -25,7 +39,7 @@ def calculate_cycle_day_and_phase(last_period_date: date, cycle_length: int = 28
         current_date = date.today()
     
     # Calculate days since last period
-    days_since_last_period = (current_date - last_period_date).days
+    days_since_last_period = current_date.toordinal() - last_period_date.toordinal()
     
     # Calculate current cycle day (modulo cycle length to handle multiple cycles)
     cycle_day = (days_since_last_period % cycle_length) + 1
@@ -36,26 +50,14 @@ def calculate_cycle_day_and_phase(last_period_date: date, cycle_length: int = 28
         # Future date, return error or handle appropriately
         return -1, "Invalid", "Current date is before last period date"
     
-    # Determine phase based on cycle day
-    if 1 <= cycle_day <= 7:
-        phase = "Menstrual Phase"
-        phase_description = "The start of your cycle, when you bleed. Low energy, potential cramps, need for rest/gentle exercise (yoga, walking)."
-    elif 8 <= cycle_day <= 13:
-        phase = "Follicular Phase"
-        phase_description = "Hormones build, follicles (eggs) mature, uterine lining thickens. Rising energy, focus, confidence; good for goal-setting."
-    elif 14 <= cycle_day <= 15:
-        phase = "Ovulatory Phase"
-        phase_description = "An ovary releases an egg (ovulation). Energy peaks, libido increases, potential for mild pain, increased cervical fluid (egg-white consistency)."
-    else:  # 16 <= cycle_day <= cycle_length
-        phase = "Luteal Phase"
-        phase_description = "Body prepares for pregnancy; progesterone rises, then drops if no pregnancy. PMS symptoms (bloating, mood swings, cravings, fatigue) as hormones drop."
-    
-    return cycle_day, phase
+    phase, phase_description = get_phase_info(cycle_day)
 
+    return cycle_day, phase, phase_description
 
-def get_phase_info(cycle_day: int) -> Tuple[str, str]:
+
+def _compute_phase(cycle_day: int) -> Tuple[str, str]:
     """
-    Get phase information for a given cycle day.
+    Determine the phase for a given cycle day.
     
     Args:
         cycle_day: The day in the cycle (1-based)
@@ -69,14 +71,94 @@ def get_phase_info(cycle_day: int) -> Tuple[str, str]:
         return "Follicular Phase", "Hormones build, follicles (eggs) mature, uterine lining thickens. Rising energy, focus, confidence; good for goal-setting."
     elif 14 <= cycle_day <= 15:
         return "Ovulatory Phase", "An ovary releases an egg (ovulation). Energy peaks, libido increases, potential for mild pain, increased cervical fluid (egg-white consistency)."
-    else:
+    else:  # 16 <= cycle_day <= cycle_length
         return "Luteal Phase", "Body prepares for pregnancy; progesterone rises, then drops if no pregnancy. PMS symptoms (bloating, mood swings, cravings, fatigue) as hormones drop."
 
 
+# Phase lookup for the default 28-day cycle, indexed by cycle day
+_PHASE_TABLE_28 = tuple(_compute_phase(day) for day in range(29))
+
+
+@lru_cache(maxsize=64)
+def get_phase_info(cycle_day: int) -> Tuple[str, str]:
+    """
+    Get phase information for a given cycle day.
+    
+    Args:
+        cycle_day: The day in the cycle (1-based)
+    
+    Returns:
+        A tuple containing (phase_name, phase_description)
+    """
+    if 0 <= cycle_day < len(_PHASE_TABLE_28):
+        return _PHASE_TABLE_28[cycle_day]
+    return _compute_phase(cycle_day)
+
+
+# Phase information indexed by the phase_id from calculate_cycle_day_batch
+PHASES_BY_ID = (
+    ("Invalid", "Current date is before last period date"),  # 0: Invalid
+    _compute_phase(1),   # 1: Menstrual
+    _compute_phase(8),   # 2: Follicular
+    _compute_phase(14),  # 3: Ovulatory
+    _compute_phase(16),  # 4: Luteal
+)
+
+
+@njit(cache=True, fastmath=True)
+def _cycle_phase(last_period_ordinals, cycle_lengths, today_ordinal):
+    n = last_period_ordinals.shape[0]
+    out_day = np.empty(n, np.int32)
+    out_phase = np.empty(n, np.int8)
+    for i in range(n):
+        days_since_last_period = today_ordinal - last_period_ordinals[i]
+        if days_since_last_period < 0:
+            out_day[i] = -1
+            out_phase[i] = 0
+            continue
+        day = days_since_last_period % cycle_lengths[i] + 1
+        out_day[i] = day
+        if day <= 7:
+            out_phase[i] = 1
+        elif day <= 13:
+            out_phase[i] = 2
+        elif day <= 15:
+            out_phase[i] = 3
+        else:
+            out_phase[i] = 4
+    return out_day, out_phase
+
+
+def calculate_cycle_day_batch(last_period_ordinals: "np.ndarray", cycle_lengths: "np.ndarray", today_ordinal: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Calculate cycle days and phases for many users at once.
+    
+    Args:
+        last_period_ordinals: Last period start dates as date.toordinal() values
+        cycle_lengths: Cycle length in days for each user
+        today_ordinal: The date to calculate from, as date.toordinal()
+    
+    Returns:
+        A tuple containing:
+        - cycle_days: int32 array of cycle days (1-based)
+        - phase_ids: int8 array of indexes into PHASES_BY_ID
+        Entries whose last period is after today_ordinal have a cycle day
+        of -1 and phase_id 0, which maps to the "Invalid" entry.
+    """
+    if np is None:
+        raise ImportError("calculate_cycle_day_batch requires numpy")
+
+    return _cycle_phase(
+        np.asarray(last_period_ordinals, dtype=np.int64),
+        np.asarray(cycle_lengths, dtype=np.int64),
+        today_ordinal,
+    )
+
+
 def main():
     """Example usage of the cycle calculator."""
     # Example: Last period was 10 days ago, with a 28-day cycle
-    last_period = date.today() - date.resolution * 10
+    last_period = date.today() - timedelta(days=10)
     cycle_length = 28
     
     cycle_day, phase, description = calculate_cycle_day_and_phase(last_period, cycle_length)
@@ -2,34 +2,25 @@
 # IMPORTS
 # ============================================================================
 
-# Import document loading utilities from LangChain Community package
-# - DirectoryLoader: Loads multiple documents from a directory
-# - TextLoader: Handles loading individual text files
+# The LangChain document loaders, text splitter, Chroma vector store and the
+# embeddings model pull in large dependency trees, so they are imported
+# inside ingest_documents() to keep "import ingest_txt" cheap
 
-# langchain_community.document_loaders provides classes to load various data types 
-# (text, PDF, CSV, web pages, etc.) into LangChain's standard Document format, 
-# enabling consistent processing for LLM applications, 
-# with examples like CSVLoader, PyPDFLoader, UnstructuredPDFLoader, 
-# and DirectoryLoader for handling multiple files, 
-# supporting both standard and lazy loading for efficiency. 
+# hnswlib builds the standalone nearest-neighbour index that query.py searches
+# directly, without going through Chroma
+import hnswlib
 
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+# NumPy holds the embedding vectors passed to hnswlib
+import numpy as np
 
-# Import text splitting utility for breaking documents into smaller chunks
-# RecursiveCharacterTextSplitter intelligently splits text while trying to
-# maintain semantic coherence by splitting on paragraphs, sentences, then words
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+# pickle saves the chunk texts and metadata that the index labels point to
+import pickle
 
-# Import embeddings model from the HuggingFace integration
-# This converts text into numerical vector representations for similarity search
-from langchain_huggingface import HuggingFaceEmbeddings
+# Thread pool used to read several source files at the same time
+from concurrent.futures import ThreadPoolExecutor
 
-# Import Chroma vector database for storing and retrieving document embeddings
-# Chroma is a lightweight, open-source vector database optimized for AI applications
-from langchain_community.vectorstores import Chroma
-
-# Standard library for operating system operations (imported but not used in this code)
-import os
+# Path handling for finding the source files to ingest
+from pathlib import Path
 
 # ============================================================================
 # CONFIGURATION CONSTANTS
@@ -43,6 +34,46 @@ DATA_PATH = "./data"
 # This allows the database to be reused across different program runs
 DB_PATH = "./chroma"
 
+# Name of the Chroma collection the chunks are stored in
+# A fixed name means every run reads from and writes to the same collection
+COLLECTION_NAME = "menstrual_v1"
+
+# HNSW index settings for the collection
+# - hnsw:space: distance metric used to compare embeddings
+# - hnsw:M: links per node; more links = better recall, bigger index
+# - hnsw:construction_ef: search width while building (ingest-time cost only)
+# - hnsw:search_ef: search width at query time; bounds graph hops per query
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+# Paths of the standalone HNSW index and the chunk store it points into
+# query.py loads these two files to answer searches without Chroma
+INDEX_PATH = f"{DB_PATH}/hnsw_index.bin"
+DOC_STORE_PATH = f"{DB_PATH}/doc_store.pkl"
+
+# Size of the all-MiniLM-L6-v2 embedding vectors
+EMBEDDING_DIM = 384
+
+# Number of chunks sent to the model per forward pass when embedding
+# Larger batches keep the model busy instead of waiting on Python overhead
+EMBED_BATCH_SIZE = 128
+
+# Number of source files read in parallel
+MAX_CONCURRENCY = 8
+
+# Number of files handed to the thread pool at a time
+# Only one window of raw file contents is held in memory at once
+LOAD_WINDOW = 4 * MAX_CONCURRENCY
+
+# Number of chunks written to Chroma at a time
+# Chunks are streamed into the database in windows of this size so the
+# whole corpus never has to be held in memory at once
+INGEST_BATCH_SIZE = 1024
+
 # ============================================================================
 # MAIN INGESTION FUNCTION
 # ============================================================================
@@ -54,32 +85,64 @@ def ingest_documents():
     This function performs the following steps:
     1. Load all .txt files from the specified directory
     2. Split documents into smaller chunks for better retrieval
-    3. Generate embeddings for each chunk using a HuggingFace model
+    3. Generate embeddings for each chunk using a quantized ONNX model
     4. Store the chunks and embeddings in a Chroma vector database
+    5. Save a standalone HNSW index of the embeddings for fast querying
+    
+    Documents are streamed through these steps, so chunks are written to
+    the database and the chunk store in batches rather than all being held
+    in memory. Only the HNSW index (the embedding vectors) is kept in
+    memory in full while it is built.
     
     The resulting vector database can be used for semantic search,
     question answering, or retrieval-augmented generation (RAG) systems.
     """
     
+    # ========================================================================
+    # IMPORTS
+    # ========================================================================
+    
+    # Import document loading utilities from LangChain Community package
+    # - TextLoader: Handles loading individual text files
+    
+    # langchain_community.document_loaders provides classes to load various data types
+    # (text, PDF, CSV, web pages, etc.) into LangChain's standard Document format,
+    # enabling consistent processing for LLM applications,
+    # with examples like CSVLoader, PyPDFLoader, UnstructuredPDFLoader,
+    # supporting both standard and lazy loading for efficiency.
+    
+    from langchain_community.document_loaders import TextLoader
+    
+    # Import text splitting utility for breaking documents into smaller chunks
+    # RecursiveCharacterTextSplitter intelligently splits text while trying to
+    # maintain semantic coherence by splitting on paragraphs, sentences, then words
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    
+    # Import the int8-quantized MiniLM embeddings model running on ONNX Runtime
+    # This converts text into numerical vector representations for similarity search
+    from onnx_embeddings import OnnxEmbeddings
+    
+    # Import Chroma vector database for storing and retrieving document embeddings
+    # Chroma is a lightweight, open-source vector database optimized for AI applications
+    from langchain_community.vectorstores import Chroma
+    
     # ========================================================================
     # STEP 1: LOAD DOCUMENTS
     # ========================================================================
     
-    # Create a DirectoryLoader to recursively load all .txt files
-    loader = DirectoryLoader(
-        DATA_PATH,              # Directory to search for documents
-        glob="**/example*.txt",        # Pattern: all subdirectories' all txt files
-        # "**/" searches all subdirectories,
-        # "*.txt" matches all text files
-        loader_cls=TextLoader  # Class used to load each individual file
-    )
+    # Find all matching .txt files in the data directory
+    # "**/" searches all subdirectories, "example*.txt" matches the text files
+    # Sorted so chunks (and the index labels built from them) come out in the
+    # same order on every run
+    paths = sorted(Path(DATA_PATH).glob("**/example*.txt"))
     
-    # Execute the loading process and return a list of Document objects
-    # Each Document contains the text content and metadata (like file path)
-    documents = loader.load()
+    def load_file(path):
+        # Load a single file into a list of Document objects
+        # Falls back to detecting the file encoding if UTF-8 decoding fails
+        return TextLoader(str(path), autodetect_encoding=True).load()
     
     # ========================================================================
-    # STEP 2: SPLIT DOCUMENTS INTO CHUNKS
+    # STEP 2: CREATE TEXT SPLITTER
     # ========================================================================
     
     # Create a text splitter with specific parameters
@@ -93,48 +156,110 @@ def ingest_documents():
                             # e.g., if a sentence is split, the overlap captures it
     )
     
-    # Split all loaded documents into smaller chunks
-    # Returns a list of Document objects, each representing one chunk
-    chunks = splitter.split_documents(documents)
-    
     # ========================================================================
     # STEP 3: CREATE EMBEDDINGS MODEL
     # ========================================================================
     
-    # Initialize the HuggingFace embeddings model
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2"  
-        # Lightweight sentence transformer model 
+    # Initialize the ONNX Runtime embeddings model
+    embeddings = OnnxEmbeddings(
+        batch_size=EMBED_BATCH_SIZE
+        # int8-quantized all-MiniLM-L6-v2 (see onnx_embeddings.py)
         # 384-dimensional embeddings
-        # ~80MB model size
-        # Good balance of speed and quality
-        # Trained on 1B+ sentence pairs
+        # Runs on the CPU using int8 dot products
     )
     
     # ========================================================================
     # STEP 4: CREATE VECTOR DATABASE
     # ========================================================================
     
-    # Create a Chroma vector database from the document chunks
-    vectordb = Chroma.from_documents(
-        documents=chunks,              # The chunked documents to store
-        embedding=embeddings,          # The embedding model to use
-        # Chroma will automatically generate embeddings for each chunk
+    # Open (or create) the Chroma vector database
+    vectordb = Chroma(
+        collection_name=COLLECTION_NAME,  # Fixed name reused across runs
+        collection_metadata=COLLECTION_METADATA,  # HNSW index settings
+        embedding_function=embeddings,  # The embedding model to use
         persist_directory=DB_PATH      
         # Where to save the database on disk
         # Enables persistence across sessions
     )
     
+    # ========================================================================
+    # STEP 5: SPLIT AND STORE CHUNKS
+    # ========================================================================
+    
+    # Read files in windows of LOAD_WINDOW on a thread pool, split each file
+    # into chunks, and flush the chunks to Chroma in fixed-size windows
+    # executor.map() returns the files in path order, not completion order
+    # Chroma generates the embeddings for each chunk as it is added
+    total_chunks = 0
+    batch = []
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        for start in range(0, len(paths), LOAD_WINDOW):
+            window = paths[start:start + LOAD_WINDOW]
+            for documents in executor.map(load_file, window):
+                batch.extend(splitter.split_documents(documents))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    vectordb.add_documents(batch)
+                    total_chunks += len(batch)
+                    batch = []
+    
+    # Store whatever is left over from the last window
+    if batch:
+        vectordb.add_documents(batch)
+        total_chunks += len(batch)
+    
     # Note: In newer versions of ChromaDB, the database automatically persists
     # to the specified directory, so no explicit .persist() call is needed
     
     # ========================================================================
-    # STEP 5: CONFIRMATION OUTPUT
+    # STEP 6: BUILD STANDALONE HNSW INDEX
+    # ========================================================================
+    
+    # Create an empty HNSW index with the same settings as the collection
+    # It grows as pages of embeddings are added below
+    index = hnswlib.Index(space="cosine", dim=EMBEDDING_DIM)
+    index.init_index(
+        max_elements=INGEST_BATCH_SIZE,
+        M=COLLECTION_METADATA["hnsw:M"],
+        ef_construction=COLLECTION_METADATA["hnsw:construction_ef"]
+    )
+    
+    # Page through everything stored in the collection, reusing the
+    # embeddings Chroma already computed instead of embedding again
+    # Each page's (content, metadata) pairs are appended to the chunk store
+    # as their own pickle record, so chunk texts are never all in memory
+    # Label i in the index refers to the i-th pair in the chunk store
+    stored = 0
+    with open(DOC_STORE_PATH, "wb") as f:
+        while True:
+            page = vectordb.get(
+                limit=INGEST_BATCH_SIZE,
+                offset=stored,
+                include=["embeddings", "documents", "metadatas"]
+            )
+            if not page["ids"]:
+                break
+            
+            count = len(page["ids"])
+            if stored + count > index.get_max_elements():
+                index.resize_index(stored + count + INGEST_BATCH_SIZE)
+            
+            index.add_items(
+                np.asarray(page["embeddings"], dtype=np.float32),
+                np.arange(stored, stored + count)
+            )
+            pickle.dump(list(zip(page["documents"], page["metadatas"])), f)
+            stored += count
+    
+    # Save the index next to the database
+    index.save_index(INDEX_PATH)
+    
+    # ========================================================================
+    # STEP 7: CONFIRMATION OUTPUT
     # ========================================================================
     
     # Print confirmation message showing how many chunks were processed
     # Useful for debugging and monitoring the ingestion process
-    print(f"Ingested {len(chunks)} chunks into ChromaDB.")
+    print(f"Ingested {total_chunks} chunks into ChromaDB.")
 
 # ============================================================================
 # SCRIPT ENTRY POINT
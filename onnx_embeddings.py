@@ -0,0 +1,82 @@
+"""
+ONNX Embeddings - Run an int8-quantized all-MiniLM-L6-v2 on ONNX Runtime for fast CPU embeddings.
+
+Export and quantize the model once before ingesting documents:
+
+    optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 onnx_mini/
+    optimum-cli onnxruntime quantize --avx512_vnni --onnx_model onnx_mini -o onnx_mini_int8/
+"""
+
+import os
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer
+
+ONNX_MODEL_PATH = "./onnx_mini_int8"
+ONNX_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+# all-MiniLM-L6-v2 truncates inputs to 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    LangChain embeddings backed by a quantized MiniLM ONNX model.
+
+    Produces the same 384-dimensional, mean-pooled and L2-normalized vectors
+    as the sentence-transformers model, so it can be used in place of
+    HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2").
+    """
+
+    def __init__(self, model_path: str = ONNX_MODEL_PATH, batch_size: int = 32):
+        """
+        Load the ONNX model and its tokenizer.
+
+        Args:
+            model_path: Directory containing the quantized ONNX model
+            batch_size: Number of texts run through the model at once
+        """
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = os.cpu_count()
+
+        self._session = ort.InferenceSession(
+            os.path.join(model_path, ONNX_MODEL_FILE),
+            sess_options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+        self._tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            encoded = self._tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            inputs = {name: encoded[name].astype(np.int64) for name in self._input_names}
+            token_embeddings = self._session.run(None, inputs)[0]
+
+            # Mean pooling over the real (non-padding) tokens, then L2 normalize
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+
+            vectors.extend(pooled.tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of document chunks."""
+        return self._embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query string."""
+        return self._embed([text])[0]
@@ -1,7 +1,23 @@
+import json
+import pickle
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+
+import hnswlib
+import numpy as np
 import requests
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma 
-# from langchain_community.vectorstores import Chroma
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from langchain_core.documents import Document
+
+from ingest_txt import (
+    COLLECTION_METADATA,
+    DOC_STORE_PATH,
+    EMBEDDING_DIM,
+    INDEX_PATH,
+)
+from onnx_embeddings import OnnxEmbeddings
 
 # ==========================
 # CONFIG
@@ -10,7 +26,9 @@ OPENROUTER_API_KEY = "sk-or-v1-96831b48da45e43109112ce20cdc6da9e435d909e644350bc
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
 MODEL_NAME = "mistralai/mistral-7b-instruct:free"
-DB_PATH = "./chroma"
+
+# Index location and settings come from the ingest script that writes them
+HNSW_SEARCH_EF = COLLECTION_METADATA["hnsw:search_ef"]
 
 HEADERS = {
     "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -19,35 +37,162 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
+# Fixed persona, sent as the system message on every turn. Keeping it
+# identical across calls lets the provider reuse its cached prefill.
+PERSONA_SYSTEM = """You are Luna, a compassionate AI health companion specializing in menstrual health and hormonal science.
+
+Your role:
+- Validate the user's experience emotionally
+- Explain how symptoms may relate to hormonal cycles
+- Be scientifically grounded but non-diagnostic
+- Warm, supportive, and concise"""
+
+# Per-turn user message; filled in with str.format on every turn.
+_PROMPT_TAIL_FMT = """{cycle}
+
+Relevant background knowledge:
+{ctx}
+
+User message:
+{msg}
+"""
+
+# One session for the whole process so the TLS connection to OpenRouter
+# is kept alive and reused across chat turns. Gateway errors are retried,
+# but read errors are not: a timed-out completion would otherwise be
+# generated (and billed) again. raise_on_status=False leaves the final
+# 5xx response for raise_for_status() to report.
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=["POST"],
+            read=0,
+            raise_on_status=False,
+        ),
+    ),
+)
+
 # ==========================
 # VECTOR RETRIEVAL
 # ==========================
+# Built lazily on first use and reused for the life of the process,
+# so the model weights and the search index are only loaded once.
+@lru_cache(maxsize=1)
+def _get_embeddings():
+    return OnnxEmbeddings()
+
+
+# The HNSW index and chunk store are written by ingest_txt.py. Searching
+# them directly skips Chroma's per-query Python overhead.
+@lru_cache(maxsize=1)
+def _get_index():
+    index = hnswlib.Index(space="cosine", dim=EMBEDDING_DIM)
+    index.load_index(INDEX_PATH)
+    index.set_ef(HNSW_SEARCH_EF)
+    return index
+
+
+@lru_cache(maxsize=1)
+def _get_doc_store():
+    # The store is a sequence of pickled pages of (content, metadata) pairs.
+    doc_store = []
+    with open(DOC_STORE_PATH, "rb") as f:
+        while True:
+            try:
+                page = pickle.load(f)
+            except EOFError:
+                break
+            doc_store.extend(
+                Document(page_content=content, metadata=metadata or {})
+                for content, metadata in page
+            )
+    return doc_store
+
+
+def _format_context(docs):
+    parts = ["- " + doc.page_content for doc in docs]
+    return "\n\n".join(parts)
+
+
+def _search(vectors, k):
+    index = _get_index()
+    doc_store = _get_doc_store()
+    k = min(k, index.get_current_count())
+
+    labels, _ = index.knn_query(np.asarray(vectors, dtype=np.float32), k=k)
+    return [[doc_store[i] for i in row] for row in labels]
+
+
+# Repeated questions skip both the embedding and the index search.
+# Keyed on (normalized query, k); results are stored as tuples so cached
+# entries can't be mutated. An explicit LRU (rather than lru_cache) lets
+# the batch path look up hits before embedding only the misses.
+_RETRIEVE_CACHE_SIZE = 128
+_retrieve_cache = OrderedDict()
+
+
+def _normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def _cache_get(key):
+    value = _retrieve_cache.get(key)
+    if value is not None:
+        _retrieve_cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key, docs):
+    value = (_format_context(docs), tuple(docs))
+    _retrieve_cache[key] = value
+    if len(_retrieve_cache) > _RETRIEVE_CACHE_SIZE:
+        _retrieve_cache.popitem(last=False)
+    return value
+
+
 def retrieve_context(query, k=4):
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2")
+    return retrieve_context_batch([query], k=k)[0]
 
-    vectordb = Chroma(
-        persist_directory=DB_PATH,
-        embedding_function=embeddings
-    )
 
-    docs = vectordb.similarity_search(query, k=k)
+def retrieve_context_batch(queries, k=4):
+    if not queries:
+        return []
 
-    context_text = "\n\n".join(
-        f"- {doc.page_content}" for doc in docs
-    )
+    keys = [(_normalize_query(query), k) for query in queries]
+
+    # Serve cache hits first; only the distinct misses are embedded, in
+    # a single batch, and searched together.
+    results = {key: _cache_get(key) for key in keys}
+    misses = [key for key, value in results.items() if value is None]
+    if misses:
+        vectors = _get_embeddings().embed_documents([query for query, _ in misses])
+        for key, docs in zip(misses, _search(vectors, k)):
+            results[key] = _cache_put(key, docs)
 
-    return context_text, docs
+    return [(results[key][0], list(results[key][1])) for key in keys]
 
 
 # ==========================
 # OPENROUTER CALL
 # ==========================
-def call_openrouter(prompt):
-    payload = {
+def _build_payload(prompt, stream=False):
+    return {
         "model": MODEL_NAME,
         "max_tokens": 1000,
+        "stream": stream,
         "messages": [
+            {
+                "role": "system",
+                "content": PERSONA_SYSTEM
+            },
             {
                 "role": "user",
                 "content": prompt
@@ -55,9 +200,12 @@ def call_openrouter(prompt):
         ]
     }
 
-    response = requests.post(
+
+def call_openrouter(prompt):
+    payload = _build_payload(prompt)
+
+    response = _SESSION.post(
         OPENROUTER_URL,
-        headers=HEADERS,
         json=payload,
         timeout=30
     )
@@ -66,52 +214,84 @@ def call_openrouter(prompt):
     return response.json()["choices"][0]["message"]["content"]
 
 
+def call_openrouter_stream(prompt):
+    """Yield the completion piece by piece as OpenRouter generates it."""
+    payload = _build_payload(prompt, stream=True)
+
+    with _SESSION.post(
+        OPENROUTER_URL,
+        json=payload,
+        timeout=30,
+        stream=True
+    ) as response:
+        response.raise_for_status()
+
+        # Server-sent events: one "data: {...}" frame per line, blank
+        # keep-alive lines and ": comment" lines in between.
+        for line in response.iter_lines():
+            if not line:
+                continue
+            line = line.decode("utf-8")
+            if not line.startswith("data: "):
+                continue
+
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+
+            chunk = json.loads(data)
+
+            # Failures after the stream has started arrive as a frame
+            # carrying an "error" object instead of a delta.
+            error = chunk.get("error")
+            if error:
+                raise RuntimeError(
+                    f"OpenRouter stream error {error.get('code')}: {error.get('message')}"
+                )
+
+            content = chunk["choices"][0]["delta"].get("content")
+            if content:
+                yield content
+
+
 # ==========================
 # MAIN LOOP
 # ==========================
 def main():
     print("🌙 Luna RAG system ready. Type 'exit' to quit.")
 
+    # Example cycle info (replace with real backend output). It only
+    # changes when the date rolls over, so build it once per session
+    # rather than on every message.
+    cycle_info_text = (
+        "Cycle context: The user is currently in her 25th day of the cycle, corresponding to the luteal phase"
+    )
+
     while True:
         user_message = input("\nUser: ")
         if user_message.lower() == "exit":
             break
 
-        # Example cycle info (replace with real backend output)
-        cycle_info_text = (
-            "Cycle context: The user is currently in her 25th day of the cycle, corresponding to the luteal phase"
-        )
-
         retrieved_context, source_docs = retrieve_context(user_message)
 
-        # ===== Final Prompt (Persona + RAG + Cycle Data) =====
-        final_prompt = f"""
-You are Luna, a compassionate AI health companion specializing in menstrual health and hormonal science.
-
-Your role:
-- Validate the user's experience emotionally
-- Explain how symptoms may relate to hormonal cycles
-- Be scientifically grounded but non-diagnostic
-- Warm, supportive, and concise
-
-{cycle_info_text}
-
-Relevant background knowledge:
-{retrieved_context}
-
-User message:
-{user_message}
-"""
+        # ===== Per-turn Prompt (RAG + Cycle Data); persona is the system message =====
+        final_prompt = _PROMPT_TAIL_FMT.format(
+            cycle=cycle_info_text,
+            ctx=retrieved_context,
+            msg=user_message
+        )
 
         try:
-            answer = call_openrouter(final_prompt)
-
-            print("\nAssistant:")
-            print(answer)
+            # Tokens are flushed as they arrive; everything after the
+            # answer goes out in a single write.
+            sys.stdout.write("\nAssistant:\n")
+            for token in call_openrouter_stream(final_prompt):
+                sys.stdout.write(token)
+                sys.stdout.flush()
 
-            print("\nSources:")
-            for doc in source_docs:
-                print(f"- {doc.metadata.get('source')}")
+            src_lines = [f"- {doc.metadata.get('source')}" for doc in source_docs]
+            sys.stdout.write("\n".join(["", "", "Sources:", *src_lines]) + "\n")
+            sys.stdout.flush()
 
         except Exception as e:
             print("❌ Error:", str(e))